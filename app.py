@@ -1,17 +1,27 @@
 """Основной модуль бэкенд-сервера для хостинга изображений с базой данных."""
 
+import email.utils
+import hashlib
 import http.server
+import io
 import re
 import logging
-import json
+import mmap
 import os
-import uuid
+import queue
+import secrets
+import select
+import socket
+import stat
+import threading
 import time
-from urllib.parse import urlparse, parse_qs
-import io
+import weakref
+from logging.handlers import QueueHandler, QueueListener
+from urllib.parse import urlparse, quote
 from PIL import Image
+import orjson
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.pool import ThreadedConnectionPool
 from dotenv import load_dotenv
 
 # Загрузка переменных окружения
@@ -21,9 +31,24 @@ load_dotenv()
 STATIC_FILES_DIR = 'static'
 UPLOAD_DIR = 'images'
 MAX_FILE_SIZE = int(os.getenv('MAX_FILE_SIZE', 5 * 1024 * 1024))
-ALLOWED_EXTENSIONS = os.getenv('ALLOWED_EXTENSIONS', '.jpg,.jpeg,.png,.gif').split(',')
+ALLOWED_EXTENSIONS = frozenset(os.getenv('ALLOWED_EXTENSIONS', '.jpg,.jpeg,.png,.gif').split(','))
 LOG_DIR = 'logs'
-ITEMS_PER_PAGE = 10
+# Способ передачи файлов без копирования: 'sendfile' или 'splice' (Linux, через pipe)
+ZERO_COPY_METHOD = os.getenv('ZERO_COPY_METHOD', 'sendfile')
+# Объем данных за один вызов splice, соответствует емкости pipe по умолчанию
+SPLICE_CHUNK_SIZE = 64 * 1024
+# Отдача загруженных файлов через nginx (X-Accel-Redirect). Включать, только если
+# приложение доступно клиентам исключительно через nginx: напрямую ответ придет без тела
+X_ACCEL_REDIRECT = os.getenv('X_ACCEL_REDIRECT', 'false').lower() in ('1', 'true', 'yes')
+# Внутренняя location nginx, из которой отдаются файлы по X-Accel-Redirect
+X_ACCEL_PREFIX = '/_protected/'
+UPLOAD_CHUNK_SIZE = 64 * 1024
+# Запас на заголовки частей и разделители multipart сверх MAX_FILE_SIZE
+MULTIPART_OVERHEAD = 4096
+# Объем начала файла, по которому изображение проверяется еще до конца загрузки
+UPLOAD_PROBE_SIZE = 64 * 1024
+ALLOWED_IMAGE_FORMATS = frozenset(('JPEG', 'PNG', 'GIF'))
+MAX_IMAGE_DIMENSION = 10000
 
 # Конфигурация БД из .env
 DB_CONFIG = {
@@ -33,21 +58,154 @@ DB_CONFIG = {
     "host": os.getenv('DATABASE_HOST', 'db'),
     "port": os.getenv('DATABASE_PORT', '5432')
 }
+DB_POOL_MAX_CONN = int(os.getenv('DB_POOL_MAX_CONN', 20))
+# Потоки обработки HTTP-соединений; число одновременных запросов к БД ограничено отдельно
+HTTP_WORKERS = int(os.getenv('HTTP_WORKERS', 64))
+# ThreadedConnectionPool держит открытыми не больше minconn свободных соединений и закрывает
+# остальные при возврате, поэтому по умолчанию пул держит прогретыми все соединения
+DB_POOL_MIN_CONN = int(os.getenv('DB_POOL_MIN_CONN', DB_POOL_MAX_CONN))
+
+# Частые запросы, которые подготавливаются (PREPARE) один раз на каждом соединении пула
+_PREPARED_STATEMENTS = {
+    'save_image': """
+        INSERT INTO images (filename, original_name, size, file_type)
+        VALUES ($1, $2, $3, $4) RETURNING id
+    """,
+    'images_json': """
+        SELECT COALESCE(json_agg(json_build_object(
+            'id', id,
+            'filename', filename,
+            'original_name', original_name,
+            'size', size,
+            'upload_time', upload_time,
+            'file_type', file_type
+        ) ORDER BY upload_time DESC), '[]')::text
+        FROM (SELECT * FROM images ORDER BY upload_time DESC LIMIT $1) AS latest
+    """,
+    'delete_image': "DELETE FROM images WHERE id = $1 RETURNING filename",
+}
+_PREPARE_SQL = 'DEALLOCATE ALL; ' + ' '.join(
+    f"PREPARE {name} AS {query.strip()};" for name, query in _PREPARED_STATEMENTS.items()
+)
 
 # Создание необходимых директорий
 for directory in [UPLOAD_DIR, LOG_DIR]:
     if not os.path.exists(directory):
         os.makedirs(directory)
 
-# Настройка логирования
-logging.basicConfig(
-    level=logging.INFO,
-    format='[%(asctime)s] %(levelname)s: %(message)s',
-    handlers=[
-        logging.FileHandler(os.path.join(LOG_DIR, 'app.log')),
-        logging.StreamHandler()
-    ]
-)
+# Корневые директории, вычисленные один раз для проверки путей в запросах
+_STATIC_ROOT = os.path.realpath(STATIC_FILES_DIR)
+_UPLOAD_ROOT = os.path.realpath(UPLOAD_DIR)
+
+# Дескриптор директории загрузок: файлы создаются и переименовываются относительно
+# него (openat/renameat), без разбора полного пути при каждой загрузке
+_UPLOAD_FD = os.open(UPLOAD_DIR, os.O_RDONLY | os.O_DIRECTORY)
+
+# Настройка логирования: потоки запросов только кладут записи в очередь,
+# а запись в файл и консоль выполняет фоновый поток QueueListener
+_log_queue = queue.Queue(-1)
+_log_formatter = logging.Formatter('[%(asctime)s] %(levelname)s: %(message)s')
+_log_handlers = [
+    logging.FileHandler(os.path.join(LOG_DIR, 'app.log')),
+    logging.StreamHandler()
+]
+for _handler in _log_handlers:
+    _handler.setFormatter(_log_formatter)
+_log_listener = QueueListener(_log_queue, *_log_handlers)
+_log_listener.start()
+logging.getLogger().setLevel(logging.INFO)
+logging.getLogger().addHandler(QueueHandler(_log_queue))
+
+# Content-Type по расширению файла
+_CONTENT_TYPES = {
+    '.html': 'text/html',
+    '.css': 'text/css',
+    '.js': 'application/javascript',
+    '.png': 'image/png',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.gif': 'image/gif',
+    '.ico': 'image/x-icon',
+}
+
+# Имя файла из заголовка Content-Disposition части multipart-запроса
+_FILENAME_RE = re.compile(rb'Content-Disposition: form-data;[^\r\n]*?filename="([^"]+)"')
+
+# Параметр boundary заголовка Content-Type: в кавычках или без них (RFC 2046)
+_BOUNDARY_RE = re.compile(r'boundary=(?:"([^"]+)"|([^\s;]+))', re.IGNORECASE)
+
+# Кэш статических файлов в памяти: путь -> (содержимое, mtime, etag, last_modified)
+_STATIC_CACHE = {}
+_STATIC_CACHE_LOCK = threading.Lock()
+
+
+def _load_static_file(full_path, mtime):
+    """Возвращает содержимое, ETag и Last-Modified статического файла, перечитывая его при изменении mtime."""
+    with _STATIC_CACHE_LOCK:
+        cached = _STATIC_CACHE.get(full_path)
+    if cached and cached[1] == mtime:
+        return cached[0], cached[2], cached[3]
+
+    with open(full_path, 'rb') as f:
+        data = f.read()
+    etag = f'"{hashlib.blake2b(data, digest_size=16).hexdigest()}"'
+    last_modified = email.utils.formatdate(mtime, usegmt=True)
+    with _STATIC_CACHE_LOCK:
+        _STATIC_CACHE[full_path] = (data, mtime, etag, last_modified)
+    return data, etag, last_modified
+
+
+def _preload_static_files():
+    """Заранее загружает все файлы STATIC_FILES_DIR в кэш, чтобы первые запросы не читали диск."""
+    count = 0
+    for dirpath, _, filenames in os.walk(_STATIC_ROOT):
+        for name in filenames:
+            full_path = os.path.join(dirpath, name)
+            try:
+                _load_static_file(full_path, os.stat(full_path).st_mtime)
+                count += 1
+            except OSError as e:
+                logging.warning(f"Не удалось загрузить static файл в кэш {full_path}: {e}")
+    return count
+
+
+def _check_image_header(image):
+    """Возвращает текст ошибки, если формат или размеры изображения недопустимы, иначе None."""
+    if image.format not in ALLOWED_IMAGE_FORMATS:
+        return f"Неподдерживаемый формат изображения: {image.format}"
+    if image.size[0] > MAX_IMAGE_DIMENSION or image.size[1] > MAX_IMAGE_DIMENSION:
+        return "Слишком большие размеры изображения"
+    return None
+
+
+class _UploadRejected(Exception):
+    """Загрузка отклонена по заголовку изображения до окончания приема тела."""
+
+
+class _ProbingWriter:
+    """Пишет содержимое файла в target и проверяет изображение по первым UPLOAD_PROBE_SIZE байтам."""
+
+    def __init__(self, target):
+        self.target = target
+        self.head = bytearray()
+
+    def write(self, data):
+        if self.head is not None:
+            self.head += data[:UPLOAD_PROBE_SIZE - len(self.head)]
+            if len(self.head) >= UPLOAD_PROBE_SIZE:
+                self._probe()
+        return self.target.write(data)
+
+    def _probe(self):
+        head, self.head = self.head, None
+        try:
+            with Image.open(io.BytesIO(head)) as image:
+                error = _check_image_header(image)
+        except Exception:
+            # Заголовок мог не уместиться в начало файла, решение примет полная проверка
+            return
+        if error:
+            raise _UploadRejected(error)
 
 
 def require_db_connection(func):
@@ -63,109 +221,134 @@ def require_db_connection(func):
 
 
 class Database:
-    """Класс для работы с базой данных PostgreSQL."""
+    """Класс для работы с базой данных PostgreSQL через пул соединений."""
 
     def __init__(self):
-        self.connection = None
+        self.pool = None
         self.max_retries = 10
         self.retry_delay = 3
+        self._pool_lock = threading.Lock()
+        # Соединения пула, на которых уже выполнен _PREPARE_SQL. Слабые ссылки: соединение,
+        # закрытое пулом, удаляется из множества вместе с самим объектом
+        self._prepared_connections = weakref.WeakSet()
+        # HTTP-потоков больше, чем соединений, а getconn() при исчерпании пула бросает
+        # PoolError вместо ожидания, поэтому выдача соединений ограничена семафором
+        self._checkout_slots = threading.BoundedSemaphore(DB_POOL_MAX_CONN)
         self.connect()
 
     def connect(self):
-        """Устанавливает соединение с базой данных."""
-        logging.info("Попытка подключения к базе данных...")
-        for attempt in range(self.max_retries):
-            try:
-                self.connection = psycopg2.connect(**DB_CONFIG, connect_timeout=10)
-                with self.connection.cursor() as cursor:
-                    cursor.execute("SELECT 1")
-                logging.info("Успешное подключение к базе данных")
+        """Создает пул соединений с базой данных."""
+        with self._pool_lock:
+            if self.is_connected():
                 return
-            except Exception as e:
-                logging.warning(f"Попытка {attempt + 1}/{self.max_retries}: Ошибка подключения: {e}")
-                if attempt < self.max_retries - 1:
-                    time.sleep(self.retry_delay)
-                else:
-                    logging.error("Не удалось подключиться к базе данных после всех попыток")
-                    self.connection = None
+            logging.info("Попытка подключения к базе данных...")
+            for attempt in range(self.max_retries):
+                try:
+                    self.pool = ThreadedConnectionPool(
+                        DB_POOL_MIN_CONN, DB_POOL_MAX_CONN, **DB_CONFIG,
+                        connect_timeout=10, keepalives=1, keepalives_idle=30,
+                        keepalives_interval=10, keepalives_count=3
+                    )
+                    logging.info("Успешное подключение к базе данных")
+                    return
+                except Exception as e:
+                    logging.warning(f"Попытка {attempt + 1}/{self.max_retries}: Ошибка подключения: {e}")
+                    if attempt < self.max_retries - 1:
+                        time.sleep(self.retry_delay)
+                    else:
+                        logging.error("Не удалось подключиться к базе данных после всех попыток")
+                        self.pool = None
 
     def is_connected(self):
-        """Проверяет, активно ли соединение с базой данных."""
-        try:
-            if self.connection and not self.connection.closed:
-                with self.connection.cursor() as cursor:
-                    cursor.execute("SELECT 1")
-                return True
-        except Exception:
-            self.connection = None
-        return False
+        """Проверяет, создан ли пул соединений с базой данных."""
+        return self.pool is not None and not self.pool.closed
 
     def ensure_connection(self):
-        """Гарантирует, что соединение с БД установлено."""
+        """Гарантирует, что пул соединений с БД создан."""
         if not self.is_connected():
             self.connect()
         return self.is_connected()
 
-    def execute_query(self, query, params=None, fetch=False):
-        """Выполняет SQL запрос к базе данных."""
+    def close(self):
+        """Закрывает все соединения пула."""
+        if self.is_connected():
+            self.pool.closeall()
+        self._prepared_connections.clear()
+
+    def execute_query(self, query, params=None, fetch=False, prepared=False, retry=False):
+        """Выполняет SQL запрос на соединении из пула.
+
+        При prepared=True на соединении сначала подготавливаются _PREPARED_STATEMENTS.
+        retry=True разрешает один повтор на другом соединении, если текущее оказалось
+        разорванным; допустимо только для запросов на чтение.
+        """
         if not self.ensure_connection():
             logging.error("Нет подключения к базе данных")
             return None
 
-        try:
-            with self.connection.cursor(cursor_factory=RealDictCursor) as cursor:
-                cursor.execute(query, params)
-                if fetch:
-                    return cursor.fetchall()
-                self.connection.commit()
-                return True
-        except psycopg2.OperationalError as e:
-            logging.error(f"Ошибка подключения к БД: {e}")
-            self.connection = None
-            return None
-        except Exception as e:
-            logging.error(f"Ошибка выполнения запроса: {e}")
-            if self.connection:
-                self.connection.rollback()
-            return None
+        # Разорванное соединение (например, после перезапуска PostgreSQL) обнаруживается
+        # по ошибке самого запроса. Запись при этом могла уже закоммититься, поэтому
+        # INSERT/DELETE не повторяются, а чтение повторяется один раз
+        attempts = 2 if retry else 1
+        with self._checkout_slots:
+            for attempt in range(attempts):
+                try:
+                    connection = self.pool.getconn()
+                except Exception as e:
+                    logging.error(f"Не удалось получить соединение из пула: {e}")
+                    return None
 
-    def save_image_metadata(self, filename, original_name, size, file_type):
-        """Сохраняет метаданные изображения в базу данных."""
-        query = "INSERT INTO images (filename, original_name, size, file_type) VALUES (%s, %s, %s, %s)"
-        return self.execute_query(query, (filename, original_name, size, file_type))
-
-    def get_images(self, page=1, per_page=ITEMS_PER_PAGE):
-        """Получает список изображений с пагинацией."""
-        offset = (page - 1) * per_page
-        query = "SELECT * FROM images ORDER BY upload_time DESC LIMIT %s OFFSET %s"
-        result = self.execute_query(query, (per_page, offset), fetch=True)
-        return result if result else []
-
-    def get_total_images_count(self):
-        """Возвращает общее количество изображений в базе."""
-        query = "SELECT COUNT(*) as count FROM images"
-        result = self.execute_query(query, fetch=True)
-        return result[0]['count'] if result else 0
-
-    def get_image(self, **filters):
-        """Получает информацию об изображении по указанным фильтрам."""
-        if not filters:
-            return None
+                broken = False
+                try:
+                    # Каждый запрос выполняется отдельно, поэтому явные commit/rollback не нужны
+                    connection.autocommit = True
+                    with connection.cursor() as cursor:
+                        if prepared and connection not in self._prepared_connections:
+                            cursor.execute(_PREPARE_SQL)
+                            self._prepared_connections.add(connection)
+                        cursor.execute(query, params)
+                        if fetch:
+                            return cursor.fetchall()
+                        return True
+                except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+                    broken = True
+                    if connection.closed and attempt < attempts - 1:
+                        logging.warning(f"Соединение с БД разорвано, повтор запроса: {e}")
+                        continue
+                    logging.error(f"Ошибка подключения к БД: {e}")
+                    return None
+                except Exception as e:
+                    logging.error(f"Ошибка выполнения запроса: {e}")
+                    return None
+                finally:
+                    if broken:
+                        self._prepared_connections.discard(connection)
+                    self.pool.putconn(connection, close=broken)
+
+    def execute_prepared(self, name, params=(), fetch=False, retry=False):
+        """Выполняет подготовленный запрос из _PREPARED_STATEMENTS по имени."""
+        query = f"EXECUTE {name}"
+        if params:
+            query += f"({', '.join(['%s'] * len(params))})"
+        return self.execute_query(query, params, fetch, prepared=True, retry=retry)
 
-        conditions = []
-        params = []
-        for field, value in filters.items():
-            conditions.append(f"{field} = %s")
-            params.append(value)
+    def save_image_metadata(self, filename, original_name, size, file_type):
+        """Сохраняет метаданные изображения в базу данных и возвращает ID записи или None."""
+        result = self.execute_prepared('save_image', (filename, original_name, size, file_type), fetch=True)
+        return result[0][0] if result else None
 
-        query = f"SELECT * FROM images WHERE {' AND '.join(conditions)} LIMIT 1"
-        result = self.execute_query(query, params, fetch=True)
-        return result[0] if result else None
+    def get_images_json(self, limit):
+        """Возвращает последние изображения готовым JSON-массивом, собранным в PostgreSQL."""
+        result = self.execute_prepared('images_json', (limit,), fetch=True, retry=True)
+        return result[0][0] if result else None
 
     def delete_image(self, image_id):
-        """Удаляет изображение из базы данных по ID."""
-        query = "DELETE FROM images WHERE id = %s"
-        return self.execute_query(query, (image_id,))
+        """Удаляет изображение из базы данных по ID.
+
+        Возвращает список удаленных строк вида (filename,): пустой, если записи
+        не было, и None при ошибке БД.
+        """
+        return self.execute_prepared('delete_image', (image_id,), fetch=True)
 
 
 # Глобальный объект для работы с базой данных
@@ -175,36 +358,80 @@ db = Database()
 class ImageHostingHandler(http.server.BaseHTTPRequestHandler):
     """Обработчик HTTP-запросов для сервера хостинга изображений."""
 
-    def _set_headers(self, status_code=200, content_type='text/html'):
+    # HTTP/1.1 позволяет клиентам переиспользовать соединение (keep-alive)
+    protocol_version = "HTTP/1.1"
+    # Буферизация ответа: заголовки и небольшие тела уходят одним вызовом send()
+    wbufsize = 1 << 16
+    # Таймаут операций с сокетом во время обработки запроса
+    timeout = 30
+    # Ожидание следующего запроса: простаивающее keep-alive соединение недолго держит поток пула
+    keepalive_timeout = 5
+
+    # CORS заголовки, добавляемые к каждому ответу одним блоком
+    _CORS_HEADERS = (
+        b"Access-Control-Allow-Origin: *\r\n"
+        b"Access-Control-Allow-Methods: GET, POST, OPTIONS, DELETE\r\n"
+        b"Access-Control-Allow-Headers: Content-Type, Authorization, X-Requested-With\r\n"
+        b"Access-Control-Allow-Credentials: true\r\n"
+    )
+
+    def handle_one_request(self):
+        """Ждет следующий запрос на соединении не дольше keepalive_timeout и обрабатывает его."""
+        # Признак того, что статус и заголовки текущего ответа уже отправлены клиенту
+        self._response_started = False
+        self.connection.settimeout(self.keepalive_timeout)
+        try:
+            self.rfile.peek(1)
+        except TimeoutError:
+            # Простаивающее keep-alive соединение закрывается штатно, без записи об ошибке
+            self.close_connection = True
+            return
+        super().handle_one_request()
+
+    def parse_request(self):
+        """Разбирает строку запроса и заголовки с обычным таймаутом вместо таймаута простоя."""
+        self.connection.settimeout(self.timeout)
+        return super().parse_request()
+
+    def _set_headers(self, status_code=200, content_type='text/html', content_length=0, headers=None):
         """Устанавливает базовые заголовки HTTP-ответа."""
+        self._response_started = True
+        if self.server.is_saturated():
+            # Все потоки заняты и новые клиенты ждут: keep-alive не удерживает поток после ответа
+            self.close_connection = True
         self.send_response(status_code)
         self.send_header('Content-type', content_type)
+        if content_length is not None:
+            self.send_header('Content-Length', str(content_length))
+        self.send_header('Connection', 'close' if self.close_connection else 'keep-alive')
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
         self.end_headers()
 
+    def _send_body(self, status_code, content_type, body):
+        """Отправляет ответ с телом, известным заранее."""
+        self._set_headers(status_code, content_type, len(body))
+        self.wfile.write(body)
+
+    def _send_server_error(self):
+        """Отправляет 500, если ответ еще не начат, иначе только закрывает соединение."""
+        if self._response_started:
+            # Второй ответ после уже отправленных заголовков испортил бы keep-alive соединение
+            self.close_connection = True
+            return
+        self._send_body(500, 'text/plain', b"500 Internal Server Error")
+
     def _get_content_type(self, file_path):
         """Определяет Content-Type по расширению файла."""
-        extension = file_path.lower()
-        if extension.endswith('.html'):
-            return 'text/html'
-        elif extension.endswith('.css'):
-            return 'text/css'
-        elif extension.endswith('.js'):
-            return 'application/javascript'
-        elif extension.endswith('.png'):
-            return 'image/png'
-        elif extension.endswith(('.jpg', '.jpeg')):
-            return 'image/jpeg'
-        elif extension.endswith('.gif'):
-            return 'image/gif'
-        else:
-            return 'application/octet-stream'
+        extension = os.path.splitext(file_path)[1].lower()
+        return _CONTENT_TYPES.get(extension, 'application/octet-stream')
 
     def end_headers(self):
         """Добавляет CORS заголовки к ответу."""
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS, DELETE')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type, Authorization, X-Requested-With')
-        self.send_header('Access-Control-Allow-Credentials', 'true')
+        # Буфер заголовков уходит в сокет только в super().end_headers(), поэтому
+        # CORS блок добавляется в него целиком, а не пишется в wfile напрямую
+        if self.request_version != 'HTTP/0.9':
+            self._headers_buffer.append(self._CORS_HEADERS)
         super().end_headers()
 
     def do_OPTIONS(self):
@@ -218,8 +445,6 @@ class ImageHostingHandler(http.server.BaseHTTPRequestHandler):
 
         if path == '/' or path == '/index.html':
             self._serve_static_file('index.html')
-        elif path == '/images-list':
-            self._serve_images_list(parsed_path.query)
         elif path == '/images-list-data':
             self._serve_images_list_data()
         elif path.startswith('/static/'):
@@ -228,174 +453,225 @@ class ImageHostingHandler(http.server.BaseHTTPRequestHandler):
         elif path.startswith('/images/'):
             self._serve_uploaded_file(path)
         else:
-            self._set_headers(404, 'text/plain')
-            self.wfile.write(b"404 Not Found")
+            self._send_body(404, 'text/plain', b"404 Not Found")
             logging.warning(f"Файл не найден: {self.path}")
 
     @require_db_connection
     def _serve_images_list_data(self):
         """Возвращает JSON с данными изображений для фронтенда."""
         try:
-            images = db.get_images(1, 1000)
-            images_data = []
-            for img in images:
-                images_data.append({
-                    'id': img['id'],
-                    'filename': img['filename'],
-                    'original_name': img['original_name'],
-                    'size': img['size'],
-                    'upload_time': img['upload_time'].isoformat(),
-                    'file_type': img['file_type']
-                })
-
-            self._set_headers(200, 'application/json')
-            self.wfile.write(json.dumps(images_data).encode('utf-8'))
-            logging.info(f"Отправлены данные {len(images_data)} изображений для фронтенда")
+            images_json = db.get_images_json(1000)
+            if images_json is None:
+                raise RuntimeError("запрос к базе данных не выполнен")
+
+            body = images_json.encode('utf-8')
+            self._send_body(200, 'application/json', body)
+            logging.info(f"Отправлены данные изображений для фронтенда ({len(body)} байт)")
         except Exception as e:
             logging.error(f"Ошибка при получении данных для фронтенда: {e}")
             self._send_error_response(500, f"Ошибка при получении данных: {e}")
 
-    @require_db_connection
-    def _serve_images_list(self, query_string):
-        """Отображает страницу со списком изображений."""
-        try:
-            params = parse_qs(query_string)
-            page = int(params.get('page', [1])[0])
-            if page < 1:
-                page = 1
-
-            images = db.get_images(page)
-            total_count = db.get_total_images_count()
-            total_pages = max(1, (total_count + ITEMS_PER_PAGE - 1) // ITEMS_PER_PAGE)
-
-            html = self._generate_images_list_html(images, page, total_pages)
-            self._set_headers(200, 'text/html')
-            self.wfile.write(html.encode('utf-8'))
-            logging.info(f"Отображен список изображений, страница {page}")
-        except Exception as e:
-            self._set_headers(500, 'text/plain')
-            self.wfile.write(b"500 Internal Server Error")
-            logging.error(f"Ошибка при отображении списка изображений: {e}")
-
-    def _generate_images_list_html(self, images, current_page, total_pages):
-        """Генерирует HTML для страницы списка изображений."""
-        table_rows = ""
-        if images:
-            for img in images:
-                size_kb = img['size'] / 1024
-                upload_time = img['upload_time'].strftime('%Y-%m-%d %H:%M:%S')
-                table_rows += f"""
-                <tr>
-                    <td><a href="/images/{img['filename']}" class="file-link" target="_blank">{img['filename']}</a></td>
-                    <td>{img['original_name']}</td>
-                    <td>{size_kb:.1f}</td>
-                    <td>{upload_time}</td>
-                    <td>{img['file_type']}</td>
-                    <td><button class="delete-btn" onclick="deleteImage({img['id']})">Удалить</button></td>
-                </tr>
-                """
-        else:
-            table_rows = '<tr><td colspan="6" class="no-data">Нет загруженных изображений</td></tr>'
-
-        pagination = '<div class="pagination">'
-        if current_page > 1:
-            pagination += f'<a href="/images-list?page={current_page - 1}">Предыдущая</a>'
-        pagination += f'<span class="current">Страница {current_page} из {total_pages}</span>'
-        if current_page < total_pages:
-            pagination += f'<a href="/images-list?page={current_page + 1}">Следующая</a>'
-        pagination += '</div>'
-
-        html = f"""
-        <!DOCTYPE html>
-        <html lang="ru">
-        <head>
-            <meta charset="UTF-8">
-            <meta name="viewport" content="width=device-width, initial-scale=1.0">
-            <title>Список изображений</title>
-            <link rel="stylesheet" href="/static/style.css">
-        </head>
-        <body>
-            <div class="container">
-                <h1>Список загруженных изображений</h1>
-                <p><a href="/">Вернуться на главную</a></p>
-                <table class="images-table">
-                    <thead>
-                        <tr>
-                            <th>Имя файла</th>
-                            <th>Оригинальное имя</th>
-                            <th>Размер (КБ)</th>
-                            <th>Дата загрузки</th>
-                            <th>Тип файла</th>
-                            <th>Действия</th>
-                        </tr>
-                    </thead>
-                    <tbody>{table_rows}</tbody>
-                </table>
-                {pagination}
-            </div>
-            <script>
-                function deleteImage(imageId) {{
-                    if (confirm('Вы уверены, что хотите удалить это изображение?')) {{
-                        fetch('/delete/' + imageId, {{ method: 'DELETE' }})
-                            .then(response => response.json())
-                            .then(data => {{
-                                if (data.status === 'success') {{
-                                    alert('Изображение успешно удалено');
-                                    location.reload();
-                                }} else {{
-                                    alert('Ошибка при удалении: ' + data.message);
-                                }}
-                            }})
-                            .catch(error => {{
-                                alert('Ошибка при удалении: ' + error);
-                            }});
-                    }}
-                }}
-            </script>
-        </body>
-        </html>
-        """
-        return html
-
     def _serve_file(self, file_path, base_dir, file_type="static"):
         """Обслуживает файлы из указанной базовой директории."""
         try:
-            full_path = os.path.join(base_dir, file_path)
-            full_path = os.path.abspath(full_path)
-            base_dir_abs = os.path.abspath(base_dir)
-
-            if not full_path.startswith(base_dir_abs):
-                self._set_headers(403, 'text/plain')
-                self.wfile.write(b"403 Forbidden")
+            full_path = os.path.realpath(os.path.join(base_dir, file_path))
+            if os.path.commonpath([full_path, base_dir]) != base_dir:
+                self._send_body(403, 'text/plain', b"403 Forbidden")
                 logging.warning(f"Попытка доступа вне директории {file_type}: {full_path}")
                 return
 
-            if os.path.exists(full_path) and os.path.isfile(full_path):
-                self._set_headers(200, self._get_content_type(full_path))
-                with open(full_path, 'rb') as f:
-                    self.wfile.write(f.read())
-                logging.info(f"Обслужен {file_type} файл: {file_path}")
-            else:
-                self._set_headers(404, 'text/plain')
-                self.wfile.write(b"404 Not Found")
+            try:
+                fd = os.open(full_path, os.O_RDONLY)
+            except (FileNotFoundError, IsADirectoryError, NotADirectoryError):
+                fd = None
+
+            f = None
+            if fd is not None:
+                # os.fdopen не закрывает дескриптор директории при ошибке, поэтому
+                # до передачи владения объекту файла дескриптор закрывается здесь
+                try:
+                    file_stat = os.fstat(fd)
+                    if stat.S_ISREG(file_stat.st_mode):
+                        f = os.fdopen(fd, 'rb')
+                finally:
+                    if f is None:
+                        os.close(fd)
+            if f is None:
+                self._send_body(404, 'text/plain', b"404 Not Found")
                 logging.warning(f"{file_type.capitalize()} файл не найден: {file_path}")
+                return
+
+            with f:
+                self._set_headers(200, self._get_content_type(full_path), file_stat.st_size)
+                self._send_file_body(f, file_stat.st_size)
+            logging.info(f"Обслужен {file_type} файл: {file_path}")
 
         except BrokenPipeError:
+            self.close_connection = True
             logging.debug("Клиент закрыл соединение")
         except Exception as e:
-            self._set_headers(500, 'text/plain')
-            self.wfile.write(b"500 Internal Server Error")
             logging.error(f"Ошибка при обслуживании {file_type} файла {file_path}: {e}")
+            self._send_server_error()
+
+    def _send_file_body(self, f, file_size):
+        """Передает содержимое файла в сокет средствами ядра (sendfile)."""
+        # TCP_CORK склеивает заголовки и начало файла в полные сегменты
+        cork = hasattr(socket, 'TCP_CORK')
+        if cork:
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_CORK, 1)
+        try:
+            # Заголовки из буфера wfile должны уйти в сокет раньше, чем sendfile запишет тело
+            self.wfile.flush()
+            if ZERO_COPY_METHOD == 'splice' and hasattr(os, 'splice'):
+                self._splice_file_body(f, file_size)
+            elif hasattr(os, 'sendfile'):
+                try:
+                    self.connection.sendfile(f, 0, file_size)
+                except OSError:
+                    # sendfile не поддерживается для этой пары дескрипторов, а данные еще не отправлены
+                    if f.tell() != 0:
+                        raise
+                    self._write_mapped_file(f, file_size)
+            else:
+                self._write_mapped_file(f, file_size)
+        finally:
+            if cork:
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_CORK, 0)
+
+    def _write_mapped_file(self, f, file_size):
+        """Записывает файл в ответ через mmap, без промежуточных буферов чтения."""
+        # mmap пустого файла невозможен, а передавать в этом случае нечего
+        if file_size:
+            with mmap.mmap(f.fileno(), file_size, access=mmap.ACCESS_READ) as mm:
+                self.wfile.write(mm)
+
+    def _splice_file_body(self, f, file_size):
+        """Передает файл в сокет через pipe вызовами splice(2), минуя user-space."""
+        out_fd = self.wfile.fileno()
+        in_fd = f.fileno()
+        pipe_r, pipe_w = os.pipe()
+        try:
+            offset = 0
+            while offset < file_size:
+                moved = os.splice(in_fd, pipe_w, min(SPLICE_CHUNK_SIZE, file_size - offset),
+                                  offset_src=offset, flags=os.SPLICE_F_MOVE)
+                if moved == 0:
+                    break
+                offset += moved
+                while moved:
+                    try:
+                        moved -= os.splice(pipe_r, out_fd, moved, flags=os.SPLICE_F_MOVE)
+                    except BlockingIOError:
+                        # Сокет с таймаутом неблокирующий: ждем освобождения буфера отправки
+                        if not select.select([], [out_fd], [], self.timeout)[1]:
+                            raise TimeoutError("Таймаут записи в сокет")
+        finally:
+            os.close(pipe_r)
+            os.close(pipe_w)
+
+    def _is_not_modified(self, etag, mtime):
+        """Проверяет условные заголовки: копия файла в кэше клиента актуальна."""
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match is not None:
+            # Слабое сравнение (RFC 9110, 13.1.2): префикс W/ не учитывается, '*' совпадает с любым
+            for tag in if_none_match.split(','):
+                tag = tag.strip()
+                if tag.startswith('W/'):
+                    tag = tag[2:]
+                if tag == '*' or tag == etag:
+                    return True
+            return False
+
+        if_modified_since = self.headers.get('If-Modified-Since')
+        if not if_modified_since:
+            return False
+        try:
+            since = email.utils.parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return int(mtime) <= since.timestamp()
 
     def _serve_static_file(self, file_path):
-        """Обслуживает статические файлы из папки static."""
+        """Обслуживает статические файлы из папки static через кэш в памяти."""
         logging.debug(f"Static file request: {file_path}")
-        self._serve_file(file_path, STATIC_FILES_DIR, "static")
+        try:
+            full_path = os.path.realpath(os.path.join(_STATIC_ROOT, file_path))
+            if os.path.commonpath([full_path, _STATIC_ROOT]) != _STATIC_ROOT:
+                self._send_body(403, 'text/plain', b"403 Forbidden")
+                logging.warning(f"Попытка доступа вне директории static: {full_path}")
+                return
+
+            try:
+                file_stat = os.stat(full_path)
+            except (FileNotFoundError, NotADirectoryError):
+                file_stat = None
+            if file_stat is None or not stat.S_ISREG(file_stat.st_mode):
+                self._send_body(404, 'text/plain', b"404 Not Found")
+                logging.warning(f"Static файл не найден: {file_path}")
+                return
+
+            data, etag, last_modified = _load_static_file(full_path, file_stat.st_mtime)
+            content_type = self._get_content_type(full_path)
+            cache_headers = {
+                'ETag': etag,
+                'Last-Modified': last_modified,
+                'Cache-Control': 'public, max-age=3600',
+            }
+            if self._is_not_modified(etag, file_stat.st_mtime):
+                self._set_headers(304, content_type, None, cache_headers)
+                return
+
+            self._set_headers(200, content_type, len(data), cache_headers)
+            self.wfile.write(data)
+            logging.info(f"Обслужен static файл: {file_path}")
+
+        except BrokenPipeError:
+            self.close_connection = True
+            logging.debug("Клиент закрыл соединение")
+        except Exception as e:
+            logging.error(f"Ошибка при обслуживании static файла {file_path}: {e}")
+            self._send_server_error()
 
     def _serve_uploaded_file(self, file_path):
         """Обслуживает загруженные пользователем изображения."""
         filename = os.path.basename(file_path)
-        self._serve_file(filename, UPLOAD_DIR, "uploaded")
+        if X_ACCEL_REDIRECT:
+            self._redirect_to_nginx(filename)
+            return
+        self._serve_file(filename, _UPLOAD_ROOT, "uploaded")
+
+    def _redirect_to_nginx(self, filename):
+        """Поручает nginx отдачу файла через заголовок X-Accel-Redirect."""
+        # Те же проверки, что и в _serve_file: nginx получает только существующий обычный файл
+        full_path = os.path.realpath(os.path.join(_UPLOAD_ROOT, filename))
+        try:
+            is_regular = (os.path.commonpath([full_path, _UPLOAD_ROOT]) == _UPLOAD_ROOT
+                          and stat.S_ISREG(os.stat(full_path).st_mode))
+        except (FileNotFoundError, NotADirectoryError):
+            is_regular = False
+        if not is_regular:
+            self._send_body(404, 'text/plain', b"404 Not Found")
+            logging.warning(f"Uploaded файл не найден: {filename}")
+            return
+        self._set_headers(200, self._get_content_type(filename), 0,
+                          {'X-Accel-Redirect': f"{X_ACCEL_PREFIX}{quote(filename)}"})
+        logging.info(f"Отдача uploaded файла передана nginx: {filename}")
+
+    def handle_expect_100(self):
+        """Отклоняет слишком большой запрос с Expect: 100-continue до того, как клиент отправит тело."""
+        try:
+            content_length = int(self.headers.get('Content-Length', 0))
+        except (TypeError, ValueError):
+            content_length = 0
+        if content_length > MAX_FILE_SIZE + MULTIPART_OVERHEAD:
+            self.close_connection = True
+            self._send_error_response(413, "Запрос слишком большой")
+            logging.warning(f"Запрос с Expect: 100-continue превышает размер: {content_length} байт")
+            return False
+        # Ответ 100 Continue выталкивается из буфера wfile сразу, иначе клиент не начнет передачу тела
+        result = super().handle_expect_100()
+        self.wfile.flush()
+        return result
 
     def do_POST(self):
         """Обрабатывает POST запросы для загрузки изображений."""
@@ -403,8 +679,9 @@ class ImageHostingHandler(http.server.BaseHTTPRequestHandler):
         if parsed_path.path == '/upload':
             self._handle_file_upload()
         else:
-            self._set_headers(404, 'text/plain')
-            self.wfile.write(b"404 Not Found")
+            # Тело неизвестного запроса не читается, поэтому соединение закрывается
+            self.close_connection = True
+            self._send_body(404, 'text/plain', b"404 Not Found")
             logging.warning(f"Неизвестный POST запрос: {self.path}")
 
     def do_DELETE(self):
@@ -414,44 +691,53 @@ class ImageHostingHandler(http.server.BaseHTTPRequestHandler):
             image_id = parsed_path.path.split('/')[-1]
             self._handle_file_delete(image_id)
         else:
-            self._set_headers(404, 'text/plain')
-            self.wfile.write(b"404 Not Found")
+            self._send_body(404, 'text/plain', b"404 Not Found")
             logging.warning(f"Неизвестный DELETE запрос: {self.path}")
 
     @require_db_connection
     def _handle_file_delete(self, image_id):
         """Удаляет файл из файловой системы и базы данных."""
+        # ID вне диапазона столбца id (SERIAL, 32 бита) заведомо не существует,
+        # а до запроса не доходит, чтобы ошибка приведения типа не превратилась в 500
+        try:
+            image_id = int(image_id)
+        except ValueError:
+            image_id = None
+        if image_id is None or not 0 < image_id < 2 ** 31:
+            self._send_error_response(404, "Изображение не найдено в базе данных")
+            logging.warning(f"Некорректный ID изображения: {self.path}")
+            return
+
         try:
-            image_info = db.get_image(id=image_id)
-            if not image_info:
+            # Сначала удаляется запись: имя файла приходит из RETURNING, без отдельного SELECT,
+            # а сбой удаления файла оставит на диске лишь файл без ссылок на него
+            deleted = db.delete_image(image_id)
+            if deleted is None:
+                self._send_error_response(500, "Ошибка при удалении из базы данных")
+                logging.error(f"Ошибка при удалении записи из базы данных: ID {image_id}")
+                return
+            if not deleted:
                 self._send_error_response(404, "Изображение не найдено в базе данных")
                 logging.warning(f"Изображение с ID {image_id} не найдено в базе данных")
                 return
 
-            filename = image_info['filename']
-            full_path = os.path.join(UPLOAD_DIR, filename)
-            full_path = os.path.abspath(full_path)
-            upload_dir = os.path.abspath(UPLOAD_DIR)
+            filename = deleted[0][0]
+            logging.info(f"Запись удалена из базы данных: ID {image_id}, файл {filename}")
 
-            if not full_path.startswith(upload_dir):
-                self._send_error_response(403, "Запрещенный путь")
-                logging.warning(f"Попытка удаления вне директории: {full_path}")
-                return
-
-            if os.path.exists(full_path) and os.path.isfile(full_path):
-                os.remove(full_path)
-                logging.info(f"Файл удален с диска: {filename}")
+            full_path = os.path.realpath(os.path.join(_UPLOAD_ROOT, filename))
+            if os.path.commonpath([full_path, _UPLOAD_ROOT]) != _UPLOAD_ROOT:
+                logging.warning(f"Файл вне директории загрузок не удаляется: {full_path}")
             else:
-                logging.warning(f"Файл не найден на диске: {filename}")
-
-            if db.delete_image(image_id):
-                self._set_headers(200, 'application/json')
-                response = {"status": "success", "message": "Файл успешно удален"}
-                self.wfile.write(json.dumps(response).encode('utf-8'))
-                logging.info(f"Запись удалена из базы данных: ID {image_id}, файл {filename}")
-            else:
-                self._send_error_response(500, "Ошибка при удалении из базы данных")
-                logging.error(f"Ошибка при удалении записи из базы данных: ID {image_id}")
+                try:
+                    os.unlink(full_path)
+                    logging.info(f"Файл удален с диска: {filename}")
+                except (FileNotFoundError, NotADirectoryError):
+                    logging.warning(f"Файл не найден на диске: {filename}")
+                except OSError as e:
+                    # Запись уже удалена, поэтому запрос все равно считается выполненным
+                    logging.error(f"Не удалось удалить файл {full_path}: {e}")
+
+            self._send_success_response({"status": "success", "message": "Файл успешно удален"})
         except Exception as e:
             self._send_error_response(500, "Ошибка при удалении файла")
             logging.error(f"Ошибка при удалении файла ID {image_id}: {e}")
@@ -460,89 +746,182 @@ class ImageHostingHandler(http.server.BaseHTTPRequestHandler):
         """Обрабатывает загрузку файлов."""
         content_type_header = self.headers.get('Content-Type', '')
         if not content_type_header.startswith('multipart/form-data'):
+            self.close_connection = True
             self._send_error_response(400, "Ожидается multipart/form-data")
             logging.warning("Ошибка загрузки: некорректный Content-Type")
             return
 
-        try:
-            boundary = content_type_header.split('boundary=')[1].encode('utf-8')
-        except IndexError:
+        boundary_match = _BOUNDARY_RE.search(content_type_header)
+        if not boundary_match:
+            self.close_connection = True
             self._send_error_response(400, "Boundary не найден в Content-Type")
             logging.warning("Ошибка загрузки: boundary не найден")
             return
+        boundary = (boundary_match.group(1) or boundary_match.group(2)).encode('utf-8')
 
         try:
             content_length = int(self.headers.get('Content-Length', 0))
-            if content_length > MAX_FILE_SIZE * 2:
-                self._send_error_response(413, "Запрос слишком большой")
-                logging.warning(f"Запрос превышает размер: {content_length} байт")
-                return
-            raw_body = self.rfile.read(content_length)
         except (TypeError, ValueError):
+            self.close_connection = True
             self._send_error_response(411, "Некорректный Content-Length")
             logging.error("Ошибка: некорректный Content-Length")
             return
-        except Exception as e:
-            self._send_error_response(500, "Ошибка при чтении запроса")
-            logging.error(f"Ошибка при чтении тела запроса: {e}")
-            return
 
-        file_data, filename = self._parse_multipart_data(raw_body, boundary)
-        if not file_data or not filename:
-            self._send_error_response(400, "Файл не найден в запросе")
-            logging.warning("Файл не найден в multipart-запросе")
+        if content_length > MAX_FILE_SIZE + MULTIPART_OVERHEAD:
+            self.close_connection = True
+            self._send_error_response(413, "Запрос слишком большой")
+            logging.warning(f"Запрос превышает размер: {content_length} байт")
             return
 
-        self._validate_and_save_file(file_data, filename)
+        # Файл пишется во временный файл по мере чтения тела и переименовывается после валидации
+        temp_filename = f"upload_{secrets.token_hex(16)}.tmp"
+        try:
+            try:
+                fd = os.open(temp_filename, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644, dir_fd=_UPLOAD_FD)
+                with os.fdopen(fd, 'wb') as target:
+                    chunks = self._read_body_chunks(content_length)
+                    filename, file_size = self._parse_multipart_data(chunks, boundary, _ProbingWriter(target))
+                    if file_size <= MAX_FILE_SIZE:
+                        for _ in chunks:
+                            pass
+            except _UploadRejected as e:
+                # Остаток тела не дочитывается, соединение закрывается после ответа
+                self.close_connection = True
+                self._send_error_response(400, str(e))
+                logging.warning(f"Загрузка отклонена по началу файла: {e}")
+                return
+            except Exception as e:
+                self.close_connection = True
+                self._send_error_response(500, "Ошибка при чтении запроса")
+                logging.error(f"Ошибка при чтении тела запроса: {e}")
+                return
 
-    def _parse_multipart_data(self, raw_body, boundary):
-        """Парсит multipart/form-data и извлекает файл."""
-        parts = raw_body.split(b'--' + boundary)
-        for part in parts:
-            if b'Content-Disposition: form-data;' in part and b'filename=' in part:
-                try:
-                    headers_end = part.find(b'\r\n\r\n')
-                    headers_str = part[:headers_end].decode('utf-8', errors='ignore')
-                    filename_match = re.search(r'filename="([^"]+)"', headers_str)
-                    if filename_match:
-                        filename = filename_match.group(1)
-                        file_data = part[headers_end + 4:].strip()
-                        return file_data, filename
-                except Exception as e:
-                    logging.error(f"Ошибка при парсинге multipart: {e}")
-                    continue
-        return None, None
+            if not filename or not file_size:
+                self._send_error_response(400, "Файл не найден в запросе")
+                logging.warning("Файл не найден в multipart-запросе")
+                return
+
+            if file_size > MAX_FILE_SIZE:
+                # Остаток тела не дочитывается, соединение закрывается после ответа
+                self.close_connection = True
+                self._send_error_response(413, f"Файл превышает максимальный размер {MAX_FILE_SIZE / (1024 * 1024):.0f}MB")
+                logging.warning(f"Файл превышает размер: {filename}, более {MAX_FILE_SIZE} байт")
+                return
 
-    def _validate_and_save_file(self, file_data, filename):
-        """Валидирует и сохраняет загруженный файл."""
-        file_size = len(file_data)
+            self._validate_and_save_file(temp_filename, filename, file_size)
+        finally:
+            try:
+                os.unlink(temp_filename, dir_fd=_UPLOAD_FD)
+            except FileNotFoundError:
+                pass
+
+    def _read_body_chunks(self, content_length):
+        """Читает тело запроса блоками по UPLOAD_CHUNK_SIZE байт."""
+        remaining = content_length
+        while remaining > 0:
+            chunk = self.rfile.read(min(UPLOAD_CHUNK_SIZE, remaining))
+            if not chunk:
+                raise ConnectionError("Клиент закрыл соединение до окончания передачи")
+            remaining -= len(chunk)
+            yield chunk
+
+    def _parse_multipart_data(self, chunks, boundary, target):
+        """Потоково парсит multipart/form-data и записывает содержимое файла в target.
+
+        Возвращает имя файла и размер его содержимого. Запись прекращается,
+        как только размер превышает MAX_FILE_SIZE.
+        """
+        delimiter = b'\r\n--' + boundary
+        # Хвост буфера, в котором может начинаться разделитель, следующий за файлом
+        keep = len(delimiter) - 1
+        buffer = bytearray(b'\r\n')
+        filename = None
+        file_size = 0
+
+        for chunk in chunks:
+            if filename is not None and len(chunk) > keep:
+                # В буфере остается не больше keep байт, поэтому блок пишется в файл
+                # срезом memoryview, без копирования в буфер
+                boundary_zone = buffer + chunk[:keep]
+                part_end = boundary_zone.find(delimiter)
+                if part_end != -1:
+                    target.write(boundary_zone[:part_end])
+                    return filename, file_size + part_end
+                part_end = chunk.find(delimiter)
+                if part_end != -1:
+                    target.write(buffer)
+                    target.write(memoryview(chunk)[:part_end])
+                    return filename, file_size + len(buffer) + part_end
+
+                target.write(buffer)
+                target.write(memoryview(chunk)[:-keep])
+                file_size += len(buffer) + len(chunk) - keep
+                buffer = bytearray(chunk[-keep:])
+                if file_size > MAX_FILE_SIZE:
+                    return filename, file_size
+                continue
+
+            buffer += chunk
+
+            while filename is None:
+                part_start = buffer.find(delimiter)
+                if part_start == -1:
+                    del buffer[:-keep]
+                    break
+                headers_start = part_start + len(delimiter)
+                if buffer[headers_start:headers_start + 2] == b'--':
+                    return None, 0
+                headers_end = buffer.find(b'\r\n\r\n', headers_start)
+                if headers_end == -1:
+                    del buffer[:part_start]
+                    break
+
+                # Заголовки части просматриваются прямо в буфере, без копирования среза
+                filename_match = _FILENAME_RE.search(buffer, headers_start, headers_end)
+                if filename_match:
+                    filename = filename_match.group(1).decode('utf-8', 'ignore')
+                del buffer[:headers_end + 4]
+
+            if filename is None:
+                continue
+
+            part_end = buffer.find(delimiter)
+            if part_end != -1:
+                with memoryview(buffer) as view:
+                    target.write(view[:part_end])
+                return filename, file_size + part_end
+
+            flush_size = len(buffer) - keep
+            if flush_size > 0:
+                with memoryview(buffer) as view:
+                    target.write(view[:flush_size])
+                del buffer[:flush_size]
+                file_size += flush_size
+                if file_size > MAX_FILE_SIZE:
+                    return filename, file_size
+
+        return None, 0
+
+    def _validate_and_save_file(self, temp_filename, filename, file_size):
+        """Валидирует загруженный файл и переносит его из временного файла в UPLOAD_DIR."""
         file_extension = os.path.splitext(filename)[1].lower()
 
         if file_extension not in ALLOWED_EXTENSIONS:
-            self._send_error_response(400, f"Неподдерживаемый формат файла. Допустимы: {', '.join(ALLOWED_EXTENSIONS)}")
+            self._send_error_response(400, f"Неподдерживаемый формат файла. Допустимы: {', '.join(sorted(ALLOWED_EXTENSIONS))}")
             logging.warning(f"Неподдерживаемый формат: {filename}")
             return
 
-        if file_size > MAX_FILE_SIZE:
-            self._send_error_response(400, f"Файл превышает максимальный размер {MAX_FILE_SIZE / (1024 * 1024):.0f}MB")
-            logging.warning(f"Файл превышает размер: {filename}, {file_size} байт")
-            return
-
         try:
-            image_data = io.BytesIO(file_data)
-            validation_image = Image.open(image_data)
-            validation_image.verify()
-            image_data.seek(0)
-            image = Image.open(image_data)
-
-            if image.format not in ['JPEG', 'PNG', 'GIF']:
-                self._send_error_response(400, f"Неподдерживаемый формат изображения: {image.format}")
-                logging.warning(f"Pillow обнаружил неподдерживаемый формат: {filename} -> {image.format}")
-                return
-
-            if image.width > 10000 or image.height > 10000:
-                self._send_error_response(400, "Слишком большие размеры изображения")
-                logging.warning(f"Изображение слишком большое: {image.size}")
+            fd = os.open(temp_filename, os.O_RDONLY, dir_fd=_UPLOAD_FD)
+            with os.fdopen(fd, 'rb') as f:
+                # Формат и размеры Pillow берет из заголовка, пиксели не декодируются до load()
+                with Image.open(f) as image:
+                    image_format = image.format
+                    error = _check_image_header(image)
+
+            if error:
+                self._send_error_response(400, error)
+                logging.warning(f"Изображение отклонено: {filename}: {error}")
                 return
 
         except Exception as e:
@@ -550,43 +929,79 @@ class ImageHostingHandler(http.server.BaseHTTPRequestHandler):
             logging.error(f"Ошибка Pillow при валидации '{filename}': {e}")
             return
 
-        unique_filename = f"{uuid.uuid4().hex}{file_extension}"
-        target_path = os.path.join(UPLOAD_DIR, unique_filename)
+        unique_filename = f"{secrets.token_hex(16)}{file_extension}"
+
+        # Сначала запись в БД, затем атомарный rename: файл под итоговым именем
+        # появляется только вместе с записью, а при ошибке БД временный файл удаляется вызывающим кодом
+        file_type = image_format.lower() if image_format else file_extension[1:]
+        image_id = db.save_image_metadata(unique_filename, filename, file_size, file_type)
+        if image_id is None:
+            self._send_error_response(500, "Ошибка при сохранении метаданных в базу данных")
+            logging.error(f"Ошибка сохранения метаданных для файла '{filename}'")
+            return
 
         try:
-            with open(target_path, 'wb') as f:
-                f.write(file_data)
-
-            file_type = image.format.lower() if image.format else file_extension[1:]
-            if db.save_image_metadata(unique_filename, filename, file_size, file_type):
-                file_url = f"/images/{unique_filename}"
-                logging.info(f"Изображение '{filename}' сохранено как '{unique_filename}'")
-                self._send_success_response({
-                    "status": "success",
-                    "message": "Файл успешно загружен.",
-                    "filename": unique_filename,
-                    "url": file_url,
-                    "original_name": filename
-                })
-            else:
-                if os.path.exists(target_path):
-                    os.remove(target_path)
-                self._send_error_response(500, "Ошибка при сохранении метаданных в базу данных")
-                logging.error(f"Ошибка сохранения метаданных для файла '{filename}'")
+            os.rename(temp_filename, unique_filename, src_dir_fd=_UPLOAD_FD, dst_dir_fd=_UPLOAD_FD)
         except Exception as e:
+            db.delete_image(image_id)
             self._send_error_response(500, "Ошибка при сохранении файла")
             logging.error(f"Ошибка сохранения файла '{filename}': {e}")
+            return
+
+        logging.info(f"Изображение '{filename}' сохранено как '{unique_filename}'")
+        self._send_success_response({
+            "status": "success",
+            "message": "Файл успешно загружен.",
+            "filename": unique_filename,
+            "url": f"/images/{unique_filename}",
+            "original_name": filename
+        })
 
     def _send_error_response(self, status_code, message):
         """Отправляет JSON ответ с ошибкой."""
-        self._set_headers(status_code, 'application/json')
         response = {"status": "error", "message": message}
-        self.wfile.write(json.dumps(response).encode('utf-8'))
+        self._send_body(status_code, 'application/json', orjson.dumps(response))
 
     def _send_success_response(self, data):
         """Отправляет JSON ответ с успешным результатом."""
-        self._set_headers(200, 'application/json')
-        self.wfile.write(json.dumps(data).encode('utf-8'))
+        self._send_body(200, 'application/json', orjson.dumps(data))
+
+
+class PooledHTTPServer(http.server.ThreadingHTTPServer):
+    """HTTP-сервер, обрабатывающий соединения в пуле потоков фиксированного размера."""
+
+    def __init__(self, server_address, handler_class, max_workers):
+        super().__init__(server_address, handler_class)
+        # Очередь на одно соединение: при занятых потоках прием новых соединений
+        # останавливается и они ждут в backlog ядра, не расходуя дескрипторы процесса
+        self._requests = queue.Queue(maxsize=1)
+        for index in range(max_workers):
+            # Потоки-демоны не задерживают завершение процесса на простаивающих соединениях
+            threading.Thread(target=self._worker, name=f'http-{index}', daemon=True).start()
+
+    def _worker(self):
+        """Обрабатывает соединения из очереди в потоке пула."""
+        while True:
+            request, client_address = self._requests.get()
+            self.process_request_thread(request, client_address)
+
+    def process_request(self, request, client_address):
+        """Передает соединение свободному потоку пула вместо создания отдельного потока."""
+        self._requests.put((request, client_address))
+
+    def is_saturated(self):
+        """Проверяет, ждет ли принятое соединение свободного потока."""
+        return not self._requests.empty()
+
+    def server_close(self):
+        """Закрывает слушающий сокет и соединения, не дождавшиеся свободного потока."""
+        super().server_close()
+        while True:
+            try:
+                request, _ = self._requests.get_nowait()
+            except queue.Empty:
+                break
+            self.shutdown_request(request)
 
 
 def run_server(port=8000):
@@ -595,12 +1010,13 @@ def run_server(port=8000):
     time.sleep(5)
 
     server_address = ('', port)
-    httpd = http.server.HTTPServer(server_address, ImageHostingHandler)
+    httpd = PooledHTTPServer(server_address, ImageHostingHandler, HTTP_WORKERS)
 
     logging.info(f"Сервер запущен на порту {port}")
     logging.info(f"Директория загрузок: {os.path.abspath(UPLOAD_DIR)}")
     logging.info(f"Директория логов: {os.path.abspath(LOG_DIR)}")
     logging.info(f"Статическая директория: {os.path.abspath(STATIC_FILES_DIR)}")
+    logging.info(f"Static файлов загружено в кэш: {_preload_static_files()}")
 
     if db.is_connected():
         logging.info("Подключение к базе данных активно")
@@ -612,10 +1028,11 @@ def run_server(port=8000):
     except KeyboardInterrupt:
         logging.info("Получен сигнал прерывания")
     finally:
-        if db.connection:
-            db.connection.close()
+        db.close()
         httpd.server_close()
+        os.close(_UPLOAD_FD)
         logging.info("Сервер остановлен")
+        _log_listener.stop()
 
 
 if __name__ == '__main__':
@@ -240,8 +240,10 @@ document.addEventListener('DOMContentLoaded', () => {
                     uploadView.classList.remove('hidden');
                     imagesView.classList.add('hidden');
                 } else {
-                    // 🔥  ПЕРЕНАПРАВЛЯЕМ НА /images-list
-                    window.location.href = '/images-list';
+                    // 🔥 СПИСОК ОТРИСОВЫВАЕТСЯ НА КЛИЕНТЕ ИЗ /images-list-data
+                    uploadView.classList.add('hidden');
+                    imagesView.classList.remove('hidden');
+                    await renderImages();
                 }
             });
         });